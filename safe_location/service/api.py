@@ -4,6 +4,7 @@ import flask
 from flask import abort, g, request, url_for, Response, Request
 import os
 from db import create_db, connect_db, DataBase, Role
+from profiling import profiled
 from schema import *
 
 
@@ -25,10 +26,21 @@ from schema import *
 
 4.  Так же Для реализации тестов  добавлен метод выбора всех записей по имени либо по создателю профиля.
     Для дальнейшего удаления из базы данных.
+
+5.  Профилирование запросов по требованию. Админ может выполнить любой запрос под cProfile,
+    передав заголовок X-self-profile или параметр ?profile= со значением 1 / true. Сводка (общее время,
+    время SQL, время генерации фейковых координат и top-N функций) возвращается админу в заголовках
+    X-self-profile-*. Кроме того, доля запросов PROFILE_SAMPLE_RATE профилируется случайным образом;
+    их сводка пишется только в лог сервиса. При заданном PROFILE_DIR полный pstats дамп сохраняется
+    в эту директорию.
 """
 
 DEBUG = True
 
+# Profiling: fraction of randomly profiled requests and optional directory for pstats dumps
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
 app = flask.Flask(__name__)
 app.config.from_object(__name__)
 
@@ -77,6 +89,7 @@ def index():
 
 
 @app.route('/user/<user_id>', methods=['GET'])
+@profiled
 def get_user(user_id) -> Response:
     caller_id = get_caller_id(request)
     dbase = DataBase(get_db())
@@ -94,6 +107,7 @@ def get_user(user_id) -> Response:
 
 
 @app.route('/user/', methods=['GET'])
+@profiled
 def get_users():
     # Return list of user profile IDs matching query parameters filter (optional)
     dbase = DataBase(get_db())
@@ -103,6 +117,7 @@ def get_users():
 
 
 @app.route('/user', methods=['POST'])
+@profiled
 def add_user() -> Response:
     caller_id = get_caller_id(request)
     new_user = User(**json.loads(request.data.decode()))
@@ -114,6 +129,7 @@ def add_user() -> Response:
 
 
 @app.route('/user/<user_id>', methods=['DELETE'])
+@profiled
 def delete_user(user_id):
     caller_id = get_caller_id(request)
     dbase = DataBase(get_db())
@@ -0,0 +1,295 @@
+"""
+Offline bulk import of user profiles from CSV / NDJSON files into users.db.
+
+Файл читается потоком, каждая запись (owner, full_name, lat, lon) проверяется
+по правилам schema.User / schema.Location. Фейковые координаты генерируются
+пакетами в отдельных процессах, а запись в базу идет большими транзакциями
+с ослабленными pragma. Количество обработанных записей сохраняется в той же
+транзакции, что и сами профили, поэтому прерванный импорт можно просто
+запустить повторно - он продолжится с последнего сохраненного пакета.
+
+Записи, не прошедшие проверку, и записи с уже существующим owner
+сохраняются в reject файл (NDJSON).
+
+Usage (from the directory the service is started from, so that both use the same users.db):
+    python service/bulk_import.py profiles.csv [--database users.db] [--workers 4] [--batch-size 5000]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+from collections import deque
+from sqlite3 import IntegrityError
+from typing import Any, Iterator, List, Optional, Tuple
+
+from db import *
+
+
+DEFAULT_BATCH_SIZE = 5000
+IMPORT_FIELDS = ('owner', 'full_name', 'lat', 'lon')
+
+# Relaxed pragmas of the import connection. They apply to this connection only, so nothing has to be
+# restored afterwards. journal_mode is left as is: each batch transaction must stay atomic on a crash.
+LOAD_PRAGMAS = ('PRAGMA synchronous = OFF', 'PRAGMA temp_store = MEMORY', 'PRAGMA cache_size = -65536')
+
+SQL_CREATE_PROGRESS_TABLE = """ CREATE TABLE IF NOT EXISTS import_progress (
+                                source   TEXT PRIMARY KEY,
+                                records  INTEGER
+                                )"""
+
+# Bytes that are not valid UTF-8 are read as lone surrogates (errors='surrogateescape')
+UNDECODABLE_BYTES = re.compile('[\udc80-\udcff]')
+
+Row = Tuple[int, str, str, float, float]
+
+
+class ImportStats:
+    """
+    Счетчики импорта и отчет о пропускной способности
+    """
+
+    def __init__(self, skipped: int = 0):
+        self.skipped = skipped
+        self.read = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+
+    def __str__(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return f"read: {self.read}, inserted: {self.inserted}, rejected: {self.rejected}, " \
+               f"skipped (resumed): {self.skipped}, {self.read / elapsed:.0f} rows/s"
+
+
+def read_records(source: str, file_format: str) -> Iterator[Any]:
+    """
+    Потоковое чтение записей из файла, без загрузки файла в память.
+    Байты, не являющиеся UTF-8, не прерывают чтение: такие записи отклоняет parse_record.
+
+    :param source: CSV or NDJSON file path
+    :param file_format: 'csv' or 'ndjson'
+    :return: Iterator of raw records (dict for CSV, text line for NDJSON)
+    """
+    with open(source, newline='', encoding='utf-8-sig', errors='surrogateescape') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield line
+
+
+def parse_record(record: Any) -> Tuple[str, str, float, float]:
+    """
+    Проверка записи по правилам schema.User / schema.Location.
+
+    :param record: Raw CSV dict or NDJSON line
+    :return: Tuple (owner, full_name, lat, lon)
+    """
+    values = [record] if isinstance(record, str) else record.values()
+    if any(isinstance(value, str) and UNDECODABLE_BYTES.search(value) for value in values):
+        raise ValueError("Record is not valid UTF-8")
+
+    if isinstance(record, str):
+        record = json.loads(record)
+    if not isinstance(record, dict):
+        raise ValueError("Record is not an object")
+
+    try:
+        owner = record['owner']
+        full_name = record['full_name']
+        lat, lon = record['lat'], record['lon']
+    except KeyError as e:
+        raise ValueError(f"Missing field {e}")
+
+    if not owner or not isinstance(owner, str):
+        raise ValueError("Owner field is empty")
+    if not isinstance(full_name, str):
+        raise ValueError("Name field is not a string")
+    if isinstance(lat, bool) or isinstance(lon, bool):
+        raise ValueError("Location fields must be numbers")
+
+    try:
+        user = User(full_name, Location(lat, lon))
+    except TypeError as e:
+        raise ValueError(str(e))
+
+    return owner, user.full_name, user.location.lat, user.location.lon
+
+
+def approximate_batch(rows: List[Row]) -> List[tuple]:
+    """
+    Генерация фейковых координат для пакета записей. Выполняется в процессах пула.
+
+    :param rows: Validated rows (record number, owner, full_name, lat, lon)
+    :return: Rows extended with fake lat, lon
+    """
+    result = []
+    for row in rows:
+        fake_location = create_approximate_location(Location(row[3], row[4]), LOCATION_APPROXIMATION_RADIUS_KM)
+        result.append((*row, fake_location.lat, fake_location.lon))
+    return result
+
+
+def read_batches(records: Iterator[Any], start: int, batch_size: int) \
+        -> Iterator[Tuple[int, List[Row], List[Tuple[int, str, Any]]]]:
+    """
+    Разбивает поток записей на пакеты и проверяет их.
+
+    :param records: Iterator of raw records, first `start` records already skipped
+    :param start: Number of the first record in the iterator
+    :param batch_size: Records per batch
+    :return: Iterator of (records processed after the batch, valid rows, rejected rows)
+    """
+    number = start
+    while True:
+        chunk = list(itertools.islice(records, batch_size))
+        if not chunk:
+            return
+
+        valid, invalid = [], []
+        for record in chunk:
+            number += 1
+            try:
+                valid.append((number, *parse_record(record)))
+            except ValueError as e:
+                invalid.append((number, str(e), record))
+        yield number, valid, invalid
+
+
+def format_reject(number: int, reason: str, record: Any) -> str:
+    if isinstance(record, str):
+        record = record.strip()
+    return json.dumps({'record': number, 'reason': reason, 'data': record}, ensure_ascii=False) + '\n'
+
+
+def store_batch(db: sqlite3.Connection, source: str, processed: int, rows: List[tuple],
+                invalid: List[Tuple[int, str, Any]], rejects, stats: ImportStats) -> None:
+    """
+    Сохраняет пакет одной транзакцией вместе с отметкой о прогрессе импорта.
+    Повторяющиеся owner (уже в базе или ранее в файле) уходят в reject файл.
+    Reject файл дописывается только после commit, чтобы при повторном запуске
+    после сбоя записи в нем не дублировались.
+    """
+    cursor = db.cursor()
+    reject_lines = [format_reject(number, reason, record) for number, reason, record in invalid]
+    inserted = 0
+
+    for number, owner, full_name, lat, lon, fake_lat, fake_lon in rows:
+        try:
+            cursor.execute(SQL_INSERT_USER, (owner, full_name, lat, lon, fake_lat, fake_lon))
+            inserted += 1
+        except IntegrityError:
+            reject_lines.append(format_reject(number, f"User with owner '{owner}' already exists.",
+                                              dict(zip(IMPORT_FIELDS, (owner, full_name, lat, lon)))))
+
+    cursor.execute("INSERT OR REPLACE INTO import_progress (source, records) VALUES (?, ?)", (source, processed))
+    db.commit()
+
+    rejects.writelines(reject_lines)
+    rejects.flush()
+
+    stats.inserted += inserted
+    stats.rejected += len(reject_lines)
+    stats.read = processed - stats.skipped
+
+
+def run_import(source: str, database: str = DB_PATH, file_format: Optional[str] = None,
+               reject_path: Optional[str] = None, workers: Optional[int] = None,
+               batch_size: int = DEFAULT_BATCH_SIZE, restart: bool = False) -> ImportStats:
+    """
+    Импорт профилей пользователей из файла в базу данных.
+
+    :param source: CSV or NDJSON file path
+    :param database: SQLite database path
+    :param file_format: 'csv' or 'ndjson', detected by file extension if not specified
+    :param reject_path: Reject file path, defaults to <source>.rejects
+    :param workers: Number of worker processes generating approximate locations
+    :param batch_size: Records per batch / transaction
+    :param restart: Ignore saved progress and start from the first record. Already imported
+                    profiles are not removed, so they are rejected as duplicates
+    :return: Import statistics
+    """
+    if batch_size < 1:
+        raise ValueError(f"Invalid batch size {batch_size}. Batch size must be positive")
+
+    source = os.path.abspath(source)
+    file_format = file_format or ('csv' if source.lower().endswith('.csv') else 'ndjson')
+    reject_path = reject_path or source + '.rejects'
+    workers = workers or os.cpu_count() or 1
+
+    create_db(database)
+    db = connect_db(database)
+    try:
+        for pragma in LOAD_PRAGMAS:
+            db.execute(pragma)
+        db.execute(SQL_CREATE_PROGRESS_TABLE)
+        if restart:
+            db.execute("DELETE FROM import_progress WHERE source = ?", (source,))
+        db.commit()
+
+        progress = db.execute("SELECT records FROM import_progress WHERE source = ?", (source,)).fetchone()
+        start = progress[0] if progress else 0
+        stats = ImportStats(skipped=start)
+        records = itertools.islice(read_records(source, file_format), start, None)
+
+        # Новый импорт начинает reject файл заново, продолжение - дописывает в него
+        reject_mode = 'a' if start else 'w'
+
+        # Не более workers * 2 пакетов в обработке одновременно, чтобы память не росла с размером файла
+        with multiprocessing.Pool(workers) as pool, \
+                open(reject_path, reject_mode, encoding='utf-8', errors='backslashreplace') as rejects:
+            pending = deque()
+            for processed, valid, invalid in read_batches(records, start, batch_size):
+                pending.append((processed, invalid, pool.apply_async(approximate_batch, (valid,))))
+                if len(pending) >= workers * 2:
+                    processed, invalid, result = pending.popleft()
+                    store_batch(db, source, processed, result.get(), invalid, rejects, stats)
+                    print(stats)
+
+            while pending:
+                processed, invalid, result = pending.popleft()
+                store_batch(db, source, processed, result.get(), invalid, rejects, stats)
+                print(stats)
+
+        return stats
+
+    finally:
+        db.rollback()
+        db.close()
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import of user profiles from CSV / NDJSON file')
+    parser.add_argument('source', help='CSV or NDJSON file with owner, full_name, lat, lon fields')
+    parser.add_argument('--database', default=DB_PATH,
+                        help='SQLite database path, users.db in the current directory by default (as the service)')
+    parser.add_argument('--format', dest='file_format', choices=('csv', 'ndjson'),
+                        help='Input file format, detected by file extension by default')
+    parser.add_argument('--rejects', dest='reject_path', help='Reject file path, <source>.rejects by default')
+    parser.add_argument('--workers', type=positive_int, help='Number of worker processes, CPU count by default')
+    parser.add_argument('--batch-size', type=positive_int, default=DEFAULT_BATCH_SIZE, help='Records per transaction')
+    parser.add_argument('--restart', action='store_true',
+                        help='Ignore saved progress and start over. Already imported profiles are not removed '
+                             'and are rejected as duplicates')
+    args = parser.parse_args()
+
+    stats = run_import(**vars(args))
+    print(f"Import finished. {stats}")
+
+
+if __name__ == '__main__':
+    main()
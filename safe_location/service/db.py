@@ -11,15 +11,17 @@ DATABASE = 'users.db'
 DB_PATH = os.path.join(os.getcwd(), DATABASE)
 GENERIC_ERROR_MESSAGE = "Database operation failed"
 USER_NOT_FOUND_MESSAGE = 'User not found'
+SQL_INSERT_USER = """ INSERT INTO users (owner, full_name, real_lat, real_lon, fake_lat, fake_lon)
+                       VALUES (?,?,?,?,?,?);"""
 
 
-def connect_db():
-    connect = sqlite3.connect(DB_PATH)
+def connect_db(path: str = DB_PATH):
+    connect = sqlite3.connect(path)
     return connect
 
 
-def create_db():
-    db = connect_db()
+def create_db(path: str = DB_PATH):
+    db = connect_db(path)
     cursor = db.cursor()
     sql_create_table = """ CREATE TABLE IF NOT EXISTS users (
                             id    INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -153,13 +155,10 @@ class DataBase:
         """
         try:
             fake_location = create_approximate_location(user.location, LOCATION_APPROXIMATION_RADIUS_KM)
-            sql_insert_user = """ INSERT INTO users (owner, full_name, real_lat, real_lon, fake_lat, fake_lon)
-                       VALUES (?,?,?,?,?,?);"""
-
             values = (caller_id,  user.full_name, user.location.lat, user.location.lon,
                       fake_location.lat, fake_location.lon)
 
-            self.cur.execute(sql_insert_user, values)
+            self.cur.execute(SQL_INSERT_USER, values)
             self.db.commit()
             user_id = self.cur.lastrowid
             return user_id
@@ -0,0 +1,148 @@
+"""
+On-demand per-request profiling of the Safe Location Service API.
+
+Запрос выполняется под cProfile, если его явно запросил администратор
+(заголовок HEADER_PROFILE или параметр запроса ?profile=1), либо если запрос
+попал в случайную выборку PROFILE_SAMPLE_RATE. Сводка возвращается в заголовках
+ответа только администратору; для выборки она пишется в лог и PROFILE_DIR.
+Остальные запросы вызывают обработчик напрямую, без профилировщика.
+"""
+
+import cProfile
+import os
+import pstats
+import random
+import time
+import uuid
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import current_app, make_response, request, Request, Response
+from werkzeug.exceptions import HTTPException
+
+import approximation
+from schema import *
+
+
+PROFILE_QUERY_FLAG = 'profile'
+PROFILE_FLAG_VALUES = ('1', 'true')
+PROFILE_TOP_N = 5
+
+HEADER_PROFILE_TOTAL = 'X-self-profile-total-ms'
+HEADER_PROFILE_SQL = 'X-self-profile-sql-ms'
+HEADER_PROFILE_APPROXIMATION = 'X-self-profile-approximation-ms'
+HEADER_PROFILE_TOP = 'X-self-profile-top'
+HEADER_PROFILE_DUMP = 'X-self-profile-dump'
+
+
+def is_flag_set(value: Optional[str]) -> bool:
+    """
+    Флаг профилирования включен только значениями '1' или 'true' (без учета регистра).
+    """
+    return value is not None and value.strip().lower() in PROFILE_FLAG_VALUES
+
+
+def is_profiling_requested(request: Request) -> bool:
+    """
+    Профилирование явно запрошено администратором: заголовок HEADER_PROFILE
+    или параметр запроса ?profile= со значением '1' / 'true'.
+
+    :param request: Received Request
+    :return: True if admin asked to profile the request
+    """
+    if request.headers.get(HEADER_CALLER_ID) != USER_ID_ADMIN:
+        return False
+
+    return is_flag_set(request.headers.get(HEADER_PROFILE)) or is_flag_set(request.args.get(PROFILE_QUERY_FLAG))
+
+
+def is_sampled(sample_rate: float) -> bool:
+    """
+    :param sample_rate: Доля запросов (0.0 - 1.0), которые профилируются без явного запроса
+    :return: True if request falls into the random sample
+    """
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def summarize(stats: pstats.Stats, top_n: int = PROFILE_TOP_N) -> Dict[str, str]:
+    """
+    Сводка профиля в виде HTTP заголовков: общее время, время SQL запросов,
+    время генерации фейковых координат и top-N функций по собственному времени.
+
+    :param stats: Collected profile statistics
+    :param top_n: Number of functions to include into the top list
+    :return: Dictionary of response headers
+    """
+    sql_time = 0.0
+    approximation_time = 0.0
+    functions: List[Tuple[float, str]] = []
+
+    for (file_name, line, func_name), (cc, nc, tottime, cumtime, callers) in stats.stats.items():
+        if file_name == '~' and 'sqlite3' in func_name:
+            sql_time += tottime
+        elif file_name == approximation.__file__:
+            approximation_time += cumtime
+        functions.append((tottime, f'{os.path.basename(file_name)}:{line}({func_name})'))
+
+    functions.sort(reverse=True)
+    top = '; '.join(f'{name}={tottime * 1000:.2f}' for tottime, name in functions[:top_n])
+
+    return {
+        HEADER_PROFILE_TOTAL: f'{stats.total_tt * 1000:.2f}',
+        HEADER_PROFILE_SQL: f'{sql_time * 1000:.2f}',
+        HEADER_PROFILE_APPROXIMATION: f'{approximation_time * 1000:.2f}',
+        HEADER_PROFILE_TOP: top,
+    }
+
+
+def dump_profile(profiler: cProfile.Profile, directory: str) -> str:
+    """
+    Сохраняет полный pstats дамп в указанную директорию.
+
+    :param profiler: Finished profiler
+    :param directory: Directory to store dump files
+    :return: Dump file name
+    """
+    os.makedirs(directory, exist_ok=True)
+    # Сервер многопоточный: uuid исключает перезапись дампов параллельных запросов
+    file_name = f'{request.endpoint}-{int(time.time() * 1000)}-{uuid.uuid4().hex}.pstats'
+    profiler.dump_stats(os.path.join(directory, file_name))
+    return file_name
+
+
+def profiled(view: Callable) -> Callable:
+    """
+    Декоратор обработчика API, выполняющий его под cProfile по требованию.
+    Сводка добавляется к ответу в виде заголовков только по явному запросу администратора.
+    Для запросов из случайной выборки сводка пишется в лог приложения, чтобы не раскрывать
+    внутренности сервиса другим пользователям. При заданном PROFILE_DIR полный дамп сохраняется на диск.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs) -> Response:
+        requested = is_profiling_requested(request)
+        if not requested and not is_sampled(current_app.config.get('PROFILE_SAMPLE_RATE', 0.0)):
+            return view(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        response = None
+        try:
+            # abort() тоже профилируется: ошибка превращается в обычный ответ со сводкой
+            try:
+                response = make_response(profiler.runcall(view, *args, **kwargs))
+            except HTTPException as e:
+                response = e.get_response()
+        finally:
+            summary = summarize(pstats.Stats(profiler))
+
+            profile_dir = current_app.config.get('PROFILE_DIR')
+            if profile_dir:
+                summary[HEADER_PROFILE_DUMP] = dump_profile(profiler, profile_dir)
+
+            if requested and response is not None:
+                response.headers.update(summary)
+            else:
+                current_app.logger.info(f'Profiled {request.method} {request.path}: {summary}')
+
+        return response
+
+    return wrapper
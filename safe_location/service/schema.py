@@ -10,6 +10,7 @@ HEADER_CONTENT_TYPE = 'Content-type'
 JSON_FORMAT = 'application/json'
 HEADER_ACCEPT = 'Accept'
 HEADER_CALLER_ID = 'X-self-caller-id'
+HEADER_PROFILE = 'X-self-profile'
 USER_ID_ADMIN = 'admin'
 
 
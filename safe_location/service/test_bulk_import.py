@@ -0,0 +1,123 @@
+import bulk_import
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from bulk_import import *
+
+
+class BulkImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.dir.name, 'users.db')
+        self.source = os.path.join(self.dir.name, 'profiles.csv')
+        # Файлы партнеров часто начинаются с BOM
+        with open(self.source, 'w', encoding='utf-8-sig') as file:
+            file.write('owner,full_name,lat,lon\n'
+                       'user_1,User 1,56.32,65.23\n'
+                       'user_2,User 2,25.235,65.632\n'
+                       'user_1,Duplicate,10.0,10.0\n'
+                       'user_3,,10.0,10.0\n'
+                       'user_4,User 4,100.0,10.0\n')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_import_and_resume(self):
+        stats = run_import(self.source, self.database, workers=1, batch_size=2)
+        self.assertEqual((stats.read, stats.inserted, stats.rejected), (5, 2, 3))
+
+        with open(self.source + '.rejects') as rejects:
+            self.assertEqual(sorted(json.loads(line)['record'] for line in rejects), [3, 4, 5])
+
+        dbase = DataBase(connect_db(self.database))
+        self.assertEqual(len(dbase.get_users_id(owner='user_1')), 1)
+        user_id = dbase.get_users_id(owner='user_2')[0]
+        self.assertEqual(dbase.get_user(user_id).location, Location(25.235, 65.632))
+        fake_location = dbase.get_user(user_id, be_real=False).location
+        self.assertTrue(0 < get_distance(Location(25.235, 65.632), fake_location) <= LOCATION_APPROXIMATION_RADIUS_KM)
+        dbase.db.close()
+
+        # Повторный запуск продолжает с сохраненной позиции и ничего не импортирует
+        stats = run_import(self.source, self.database, workers=1, batch_size=2)
+        self.assertEqual((stats.skipped, stats.read, stats.inserted), (5, 0, 0))
+
+    def test_resume_after_interruption(self):
+        store_batch = bulk_import.store_batch
+        calls = []
+
+        def failing_store_batch(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('Import interrupted')
+            store_batch(*args)
+
+        with mock.patch('bulk_import.store_batch', side_effect=failing_store_batch):
+            with self.assertRaises(RuntimeError):
+                run_import(self.source, self.database, workers=1, batch_size=2)
+
+        stats = run_import(self.source, self.database, workers=1, batch_size=2)
+        self.assertEqual((stats.skipped, stats.read, stats.inserted, stats.rejected), (2, 3, 0, 3))
+
+        dbase = DataBase(connect_db(self.database))
+        self.assertEqual(len(dbase.get_users_id()), 2)
+        self.assertEqual(len(dbase.get_users_id(owner='user_1')), 1)
+        dbase.db.close()
+
+        with open(self.source + '.rejects') as rejects:
+            self.assertEqual(sorted(json.loads(line)['record'] for line in rejects), [3, 4, 5])
+
+    def test_ndjson_import(self):
+        source = os.path.join(self.dir.name, 'profiles.ndjson')
+        with open(source, 'w') as file:
+            file.write('{"owner": "user_1", "full_name": "User 1", "lat": 56.32, "lon": 65.23}\n'
+                       '{"owner": "user_2", "full_name"\n'
+                       '[1, 2]\n'
+                       '\n'
+                       '{"owner": "user_3", "full_name": "User 3", "lat": 10.0}\n'
+                       '{"owner": "user_4", "full_name": {"x": 1}, "lat": 1, "lon": 1}\n'
+                       '{"owner": "user_5", "full_name": ["User 5"], "lat": 1, "lon": 1}\n'
+                       '{"owner": "user_6", "full_name": 123, "lat": 1, "lon": 1}\n'
+                       '{"owner": "user_7", "full_name": "User 7", "lat": true, "lon": 1}\n'
+                       '{"owner": "user_8", "full_name": "User 8", "lat": 10, "lon": 20}\n')
+
+        stats = run_import(source, self.database, workers=1)
+        self.assertEqual((stats.read, stats.inserted, stats.rejected), (9, 2, 7))
+
+        with open(source + '.rejects') as rejects:
+            reasons = {json.loads(line)['record']: json.loads(line)['reason'] for line in rejects}
+        self.assertEqual(reasons[3], 'Record is not an object')
+        self.assertEqual(reasons[4], "Missing field 'lon'")
+        self.assertEqual([reasons[i] for i in (5, 6, 7)], ['Name field is not a string'] * 3)
+        self.assertEqual(reasons[8], 'Location fields must be numbers')
+
+    def test_invalid_utf8_record_is_rejected(self):
+        with open(self.source, 'ab') as file:
+            file.write(b'user_5,User \xff\xfe,10.0,10.0\nuser_6,User 6,10.0,10.0\n')
+
+        stats = run_import(self.source, self.database, workers=1)
+        self.assertEqual((stats.read, stats.inserted, stats.rejected), (7, 3, 4))
+
+        with open(self.source + '.rejects', encoding='utf-8') as rejects:
+            reasons = {json.loads(line)['record']: json.loads(line)['reason'] for line in rejects}
+        self.assertEqual(reasons[6], 'Record is not valid UTF-8')
+
+    def test_restart(self):
+        run_import(self.source, self.database, workers=1)
+        stats = run_import(self.source, self.database, workers=1, restart=True)
+
+        # Профили первого запуска не удаляются и отклоняются как повторяющиеся,
+        # reject файл содержит только записи нового запуска
+        self.assertEqual((stats.skipped, stats.read, stats.inserted, stats.rejected), (0, 5, 0, 5))
+        with open(self.source + '.rejects') as rejects:
+            self.assertEqual(sorted(json.loads(line)['record'] for line in rejects), [1, 2, 3, 4, 5])
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(ValueError):
+            run_import(self.source, self.database, workers=1, batch_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
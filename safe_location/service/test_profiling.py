@@ -0,0 +1,96 @@
+import cProfile
+import os
+import pstats
+import tempfile
+import unittest
+
+import flask
+from profiling import *
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.config['PROFILE_SAMPLE_RATE'] = 1.0
+
+        @self.app.route('/user/')
+        @profiled
+        def get_users():
+            return 'ok'
+
+        @self.app.route('/user/<user_id>')
+        @profiled
+        def get_user(user_id):
+            flask.abort(404)
+
+        @self.app.route('/user', methods=['POST'])
+        @profiled
+        def add_user():
+            raise RuntimeError('Unexpected error')
+
+        self.client = self.app.test_client()
+
+    def test_profiling_requested_by_admin_only(self):
+        with self.app.test_request_context(headers={HEADER_CALLER_ID: USER_ID_ADMIN, HEADER_PROFILE: '1'}):
+            self.assertTrue(is_profiling_requested(request))
+        with self.app.test_request_context('/?profile=1', headers={HEADER_CALLER_ID: USER_ID_ADMIN}):
+            self.assertTrue(is_profiling_requested(request))
+        with self.app.test_request_context(headers={HEADER_CALLER_ID: 'test_user_1', HEADER_PROFILE: '1'}):
+            self.assertFalse(is_profiling_requested(request))
+        with self.app.test_request_context(headers={HEADER_CALLER_ID: USER_ID_ADMIN}):
+            self.assertFalse(is_profiling_requested(request))
+
+    def test_profiling_flag_values(self):
+        for value, expected in (('1', True), ('true', True), ('True', True),
+                                ('0', False), ('false', False), ('', False)):
+            with self.app.test_request_context(f'/?profile={value}', headers={HEADER_CALLER_ID: USER_ID_ADMIN}):
+                self.assertEqual(is_profiling_requested(request), expected)
+            with self.app.test_request_context(headers={HEADER_CALLER_ID: USER_ID_ADMIN, HEADER_PROFILE: value}):
+                self.assertEqual(is_profiling_requested(request), expected)
+
+    def test_sampled_response_has_no_profile_headers(self):
+        response = self.client.get('/user/', headers={HEADER_CALLER_ID: 'someone', HEADER_PROFILE: '1'})
+        self.assertFalse([name for name in response.headers.keys() if name.startswith(HEADER_PROFILE)])
+
+        response = self.client.get('/user/', headers={HEADER_CALLER_ID: USER_ID_ADMIN})
+        self.assertFalse([name for name in response.headers.keys() if name.startswith(HEADER_PROFILE)])
+
+        response = self.client.get('/user/?profile=1', headers={HEADER_CALLER_ID: USER_ID_ADMIN})
+        self.assertIn(HEADER_PROFILE_TOTAL, response.headers)
+
+    def test_summarize(self):
+        profiler = cProfile.Profile()
+        location = Location(25.235, 65.632)
+        profiler.runcall(approximation.create_approximate_location, location, 1.0)
+        headers = summarize(pstats.Stats(profiler), top_n=3)
+
+        self.assertGreater(float(headers[HEADER_PROFILE_APPROXIMATION]), 0)
+        self.assertEqual(float(headers[HEADER_PROFILE_SQL]), 0)
+        self.assertEqual(len(headers[HEADER_PROFILE_TOP].split('; ')), 3)
+
+    def test_aborted_request_is_profiled(self):
+        response = self.client.get('/user/1?profile=1', headers={HEADER_CALLER_ID: USER_ID_ADMIN})
+        self.assertEqual(response.status_code, 404)
+        self.assertIn(HEADER_PROFILE_TOTAL, response.headers)
+
+    def test_profile_dump(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            self.app.config['PROFILE_DIR'] = profile_dir
+
+            first = self.client.get('/user/?profile=1', headers={HEADER_CALLER_ID: USER_ID_ADMIN})
+            second = self.client.get('/user/?profile=1', headers={HEADER_CALLER_ID: USER_ID_ADMIN})
+            self.assertNotEqual(first.headers[HEADER_PROFILE_DUMP], second.headers[HEADER_PROFILE_DUMP])
+
+            dump_path = os.path.join(profile_dir, first.headers[HEADER_PROFILE_DUMP])
+            self.assertTrue(os.path.isfile(dump_path))
+            self.assertTrue(pstats.Stats(dump_path).stats)
+
+            # Запрос из выборки, завершившийся исключением, все равно сохраняет дамп
+            response = self.client.post('/user', headers={HEADER_CALLER_ID: 'someone'})
+            self.assertEqual(response.status_code, 500)
+            self.assertEqual(len(os.listdir(profile_dir)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()